@@ -1,6 +1,40 @@
+import zlib
+from contextlib import closing, contextmanager
+from datetime import datetime, timedelta, timezone
+from itertools import takewhile
+
 from requests_cache import BaseCache, SQLiteCache
+from requests_cache.serializers import SerializerPipeline, Stage, pickle_serializer
 
 _REQUEST_CACHE_BACKEND = None
+_REQUEST_CACHE_NAME = "grist_cache"
+
+# Per-connection tuning for the mostly-read cache workload: a ~64 MB page
+# cache, 256 MB of memory-mapped I/O and in-memory temporary tables.
+_SQLITE_PRAGMAS = (
+    "PRAGMA cache_size=-64000",
+    "PRAGMA mmap_size=268435456",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA journal_size_limit=67108864",
+)
+# milliseconds a writer waits on a lock held by another process
+_SQLITE_BUSY_TIMEOUT = 5000
+
+# Grist JSON compresses well, so larger pickled responses are stored deflated
+_COMPRESS_MIN_SIZE = 4096
+
+def _compress(data: bytes) -> bytes:
+    return zlib.compress(data, 1) if len(data) > _COMPRESS_MIN_SIZE else data
+
+def _decompress(data: bytes) -> bytes:
+    # pickles start with the PROTO opcode (0x80), zlib streams with 0x78
+    return zlib.decompress(data) if data[:1] == b"\x78" else data
+
+_SERIALIZER = SerializerPipeline(
+    [*pickle_serializer.stages, Stage(dumps=_compress, loads=_decompress)],
+    name="pickle_zlib",
+    is_binary=True,
+)
 
 def setup_request_cache_backend(backend: BaseCache):
     global _REQUEST_CACHE_BACKEND
@@ -9,6 +43,82 @@ def setup_request_cache_backend(backend: BaseCache):
 def request_cache_backend():
     global _REQUEST_CACHE_BACKEND
     if _REQUEST_CACHE_BACKEND is None:
-        _REQUEST_CACHE_BACKEND = SQLiteCache()
+        # requests-cache >= 1.0 stores ``expires`` in its own indexed column,
+        # so expiry checks and cleanup never have to deserialize responses.
+        _REQUEST_CACHE_BACKEND = SQLiteCache(
+            db_path=_REQUEST_CACHE_NAME,
+            fast_save=True,
+            wal=True,
+            busy_timeout=_SQLITE_BUSY_TIMEOUT,
+            serializer=_SERIALIZER,
+        )
+        _tune_sqlite_backend(_REQUEST_CACHE_BACKEND)
+
+    return _REQUEST_CACHE_BACKEND
+
+def _tune_sqlite_backend(backend: SQLiteCache):
+    # responses and redirects share a lock but each opens its own connection
+    for storage in (backend.responses, backend.redirects):
+        storage.connection = _tuned_connection(storage.connection)
+
+def _tuned_connection(connection):
+    # requests-cache reopens its connection, e.g. in ``clear()``, so every new
+    # one is tuned on first use
+    tuned = [None]
+
+    @contextmanager
+    def tuned_connection(commit=False):
+        with connection(commit=commit) as con:
+            if con is not tuned[0]:
+                for pragma in _SQLITE_PRAGMAS:
+                    con.execute(pragma)
+                tuned[0] = con
+            yield con
+
+    return tuned_connection
+
+def cleanup(max_stale: int = 0):
+    """
+    Remove expired responses from the request cache.
+
+    Responses that expired less than ``max_stale`` seconds ago are kept:
+    requests-cache revalidates those with ``If-None-Match`` when the server
+    sent an ``ETag``, so an unchanged document costs a 304 instead of the
+    full body.
 
-    return _REQUEST_CACHE_BACKEND
\ No newline at end of file
+    With the SQLite backend this reads the indexed ``expires`` column: a
+    single ``DELETE ... WHERE expires <= ?`` without ``max_stale``, and a scan
+    that stops at the first response to keep with it.
+    """
+    backend = request_cache_backend()
+    is_sqlite = isinstance(backend, SQLiteCache)
+    # only SQLite vacuums, which rewrites the whole database
+    options = {"vacuum": False} if is_sqlite else {}
+    if not max_stale:
+        backend.delete(expired=True, **options)
+    else:
+        cutoff = datetime.now(timezone.utc) - timedelta(seconds=max_stale)
+        if is_sqlite:
+            # in expiry order, after the responses that never expire; the
+            # read is closed before the delete, which it would otherwise block
+            with closing(backend.sorted(key="expires")) as responses:
+                keys = [
+                    response.cache_key
+                    for response in takewhile(
+                        lambda response: response.expires is None
+                        or response.expires <= cutoff,
+                        responses,
+                    )
+                    if response.expires is not None
+                ]
+        else:
+            keys = [
+                response.cache_key
+                for response in backend.filter(valid=False, expired=True)
+                if response.expires is not None and response.expires <= cutoff
+            ]
+        backend.delete(*keys, **options)
+    if is_sqlite:
+        # refresh the query planner statistics after a large delete
+        with backend.responses.connection() as con:
+            con.execute("PRAGMA optimize")
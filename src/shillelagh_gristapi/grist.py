@@ -5,21 +5,55 @@ An adapter for the Grist API.
 from datetime import (
     date,
     datetime,
+    timezone,
 )
+from collections import OrderedDict
 from typing import (
     Any,
+    Callable,
     Dict,
     Iterator,
     List,
     Optional,
     Tuple,
 )
+import functools
+import hashlib
+import io
+import itertools
 import logging
 import os
+import random
+import re
+import socket
+import threading
+import time
 import urllib.parse
 
 import requests
 import requests_cache
+from requests.adapters import HTTPAdapter
+from requests_cache import BaseCache
+from requests_cache.cache_keys import create_key
+from urllib3.connection import HTTPConnection
+from urllib3.util.retry import Retry
+
+try:
+    from orjson import dumps as _orjson_dumps, loads as json_loads
+
+    def json_dumps(obj: Any) -> str:
+        return _orjson_dumps(obj).decode()
+
+    _HAS_ORJSON = True
+except ImportError:  # orjson is an optional speedup
+    from json import dumps as json_dumps, loads as json_loads
+
+    _HAS_ORJSON = False
+
+try:
+    import ijson
+except ImportError:  # ijson is an optional speedup
+    ijson = None
 
 from . import request_cache_backend
 
@@ -35,6 +69,7 @@ from shillelagh.fields import (
     String,
 )
 from shillelagh.filters import (
+    Equal,
     Filter,
     Range,
 )
@@ -56,6 +91,389 @@ else:
     logging.basicConfig(level=logging.ERROR)
 
 
+# Dates and timestamps tend to repeat across rows, and the results are
+# immutable, so conversions are memoized.
+@functools.lru_cache(maxsize=4096)
+def _timestamp_to_date(value: Any) -> date:
+    return date.fromtimestamp(int(value))
+
+
+@functools.lru_cache(maxsize=4096)
+def _timestamp_to_datetime(value: Any) -> datetime:
+    return datetime.fromtimestamp(int(value))
+
+
+def _join_list(value: List[Any]) -> str:
+    try:
+        # choice lists only hold strings, which join without conversion
+        return ",".join(value)
+    except TypeError:
+        return ",".join(map(str, value))
+
+
+def _range_bounds(bound: Range) -> Tuple[Any, Any, bool, bool]:
+    """
+    The bounds of a range as SQLite applies them to the rows yielded.
+
+    ``DateTime`` cells are yielded naive, and SQLite compares their text with
+    the bound's, which is in UTC when the bound is aware. The cell's text is
+    then a prefix of an equal bound's, so it sorts below it.
+    """
+    start, end = bound.start, bound.end
+    include_start, include_end = bound.include_start, bound.include_end
+    if isinstance(start, datetime) and start.tzinfo is not None:
+        start = start.astimezone(timezone.utc).replace(tzinfo=None)
+        include_start = False
+    if isinstance(end, datetime) and end.tzinfo is not None:
+        end = end.astimezone(timezone.utc).replace(tzinfo=None)
+        include_end = True
+    return start, end, include_start, include_end
+
+
+def _range_position(
+    value: Any,
+    start: Any,
+    end: Any,
+    include_start: bool,
+    include_end: bool,
+) -> Optional[int]:
+    """
+    Place a cell before (-1), inside (0) or after (1) a range, or return
+    ``None`` when only SQLite can compare it.
+    """
+    if value is None:
+        # NULL matches no range
+        return -1
+    try:
+        if start is not None and (
+            value < start or (value == start and not include_start)
+        ):
+            return -1
+        if end is not None and (value > end or (value == end and not include_end)):
+            return 1
+    except TypeError:
+        # e.g. text in a numeric column
+        return None
+    return 0
+
+
+# Converters applied to non-null Grist values, keyed by field class
+_CONVERTERS: Dict[type, Callable[[Any], Any]] = {
+    Date: _timestamp_to_date,
+    DateTime: _timestamp_to_datetime,
+}
+
+
+def _record_converter(
+    converters: Dict[str, Callable[[Any], Any]],
+) -> Callable[[Dict[str, Any]], Row]:
+    """
+    Build the function turning a decoded Grist record into a row.
+    """
+    get_converter = converters.get
+    join_list = _join_list
+    is_instance = isinstance
+    # checked once per statement rather than once per row
+    debug = logger.isEnabledFor(logging.DEBUG)
+
+    def convert(record: Dict[str, Any]) -> Row:
+        # records are freshly decoded, so each row is converted in place
+        # instead of being copied into a new dict
+        field = record["fields"]
+        if debug:
+            logger.debug("field=%r", field)
+        for k, v in field.items():
+            if v is not None:
+                convert_value = get_converter(k)
+                if convert_value is not None:
+                    field[k] = convert_value(v)
+                elif is_instance(v, list):
+                    # ChoiceList, RefList and Attachments cells, and error
+                    # cells; other values in those columns are alt text
+                    field[k] = join_list(v)
+        field["id"] = record["id"]
+        return field
+
+    return convert
+
+
+def _projected_record_converter(
+    converters: Dict[str, Callable[[Any], Any]],
+    columns: Tuple[str, ...],
+) -> Callable[[Dict[str, Any]], Row]:
+    """
+    Like ``_record_converter``, but only reads and converts ``columns``.
+    """
+    get_converter = converters.get
+    join_list = _join_list
+    is_instance = isinstance
+    names = tuple(column for column in columns if column != "id")
+
+    def convert(record: Dict[str, Any]) -> Row:
+        field = record["fields"]
+        row = {"id": record["id"]}
+        for k in names:
+            v = field.get(k)
+            if v is not None:
+                convert_value = get_converter(k)
+                if convert_value is not None:
+                    v = convert_value(v)
+                elif is_instance(v, list):
+                    v = join_list(v)
+            row[k] = v
+        return row
+
+    return convert
+
+
+def _cache_key(request: requests.PreparedRequest, **kwargs: Any) -> str:
+    """
+    Cache key that keeps responses for different API keys apart.
+
+    requests-cache strips ``Authorization`` from its default key, which would
+    let adapters configured with different keys share cached responses.
+    """
+    key = create_key(request, **kwargs)
+    authorization = request.headers.get("Authorization", "")
+    return hashlib.sha256(f"{key}:{authorization}".encode()).hexdigest()[:32]
+
+
+# Lifetimes (in seconds) of cached Grist responses, for metadata (workspaces,
+# tables, columns) and table records. Each one is jittered by up to
+# +/- _TTL_JITTER so responses cached together don't all expire together.
+_METADATA_TTL = 180
+_RECORDS_TTL = 180
+_TTL_JITTER = 0.1
+
+
+def _jittered(ttl: int) -> int:
+    return round(ttl * random.uniform(1 - _TTL_JITTER, 1 + _TTL_JITTER))
+
+
+# Probe idle connections after a minute, then every 15 s, and give up after
+# 4 unanswered probes. The kernel default waits two hours before probing.
+_KEEPALIVE_SOCKET_OPTIONS = [(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)] + [
+    (socket.IPPROTO_TCP, getattr(socket, name), value)
+    for name, value in (("TCP_KEEPIDLE", 60), ("TCP_KEEPINTVL", 15), ("TCP_KEEPCNT", 4))
+    if hasattr(socket, name)
+]
+
+
+class _KeepAliveAdapter(HTTPAdapter):
+    """
+    An ``HTTPAdapter`` whose sockets have TCP keep-alive enabled, so pooled
+    connections dropped while idle are noticed instead of hanging a request.
+    """
+
+    def init_poolmanager(self, *args, **kwargs):
+        kwargs.setdefault(
+            "socket_options",
+            HTTPConnection.default_socket_options + _KEEPALIVE_SOCKET_OPTIONS,
+        )
+        super().init_poolmanager(*args, **kwargs)
+
+
+@functools.lru_cache(maxsize=32)
+def _get_session(backend: BaseCache) -> requests_cache.CachedSession:
+    """
+    Return the process-wide session for a cache backend.
+
+    Sharing the session keeps connections (and TLS handshakes) alive across
+    adapter instances, i.e. across queries.
+    """
+    session = requests_cache.CachedSession(
+        backend=backend,
+        expire_after=_METADATA_TTL,
+        key_fn=_cache_key,
+    )
+    http_adapter = _KeepAliveAdapter(
+        pool_connections=16,
+        pool_maxsize=64,
+        max_retries=Retry(
+            total=3,
+            backoff_factor=0.3,
+            status_forcelist=(429, 502, 503, 504),
+        ),
+    )
+    session.mount("http://", http_adapter)
+    session.mount("https://", http_adapter)
+    return session
+
+
+# Identical requests in flight, keyed like ``_metadata_cache`` plus the query
+# parameters, each with a lock and the number of callers waiting on it.
+_inflight: Dict[Tuple[Any, ...], List[Any]] = {}
+_inflight_lock = threading.Lock()
+
+
+def _coalesced_get(
+    session: requests.Session,
+    url: str,
+    headers: Dict[str, str],
+    params: Optional[Dict[str, Any]] = None,
+    **kwargs: Any,
+) -> requests.Response:
+    """
+    GET ``url``, letting concurrent identical requests share one round trip.
+
+    Callers after the first wait for it to finish, then replay its response
+    from the request cache instead of sending their own request.
+    """
+    key = (url, headers["Authorization"], tuple(sorted((params or {}).items())))
+    with _inflight_lock:
+        entry = _inflight.get(key)
+        if entry is None:
+            entry = _inflight[key] = [threading.Lock(), 0]
+        entry[1] += 1
+    try:
+        with entry[0]:
+            return session.get(url, headers=headers, params=params, **kwargs)
+    finally:
+        with _inflight_lock:
+            entry[1] -= 1
+            if not entry[1]:
+                del _inflight[key]
+
+
+# In-process cache of decoded metadata payloads (workspaces, tables, columns)
+# in front of the HTTP cache, so repeated statements skip both the request and
+# the JSON decoding. Payloads are shared: callers must not mutate them.
+_METADATA_CACHE_SIZE = 256
+_metadata_cache: "OrderedDict[Tuple[str, str], Tuple[float, Any]]" = OrderedDict()
+_metadata_lock = threading.Lock()
+
+
+def _get_metadata(
+    session: requests.Session,
+    url: str,
+    headers: Dict[str, str],
+) -> Any:
+    """
+    GET and decode a Grist metadata endpoint, memoized for ``_METADATA_TTL``.
+    """
+    key = (url, headers["Authorization"])
+    now = time.monotonic()
+    with _metadata_lock:
+        entry = _metadata_cache.get(key)
+        if entry is not None and entry[0] > now:
+            _metadata_cache.move_to_end(key)
+            return entry[1]
+
+    ttl = _jittered(_METADATA_TTL)
+    response = _coalesced_get(session, url, headers, expire_after=ttl)
+    payload = json_loads(response.content)
+    if response.ok:
+        deadline = now + ttl
+        if response.from_cache and response.expires is not None:
+            # a cached response may be close to expiry, and must not outlive it;
+            # ``expires`` is aware UTC from requests-cache 1.2 on
+            remaining = response.expires - datetime.now(timezone.utc)
+            deadline = now + remaining.total_seconds()
+        with _metadata_lock:
+            _metadata_cache[key] = (deadline, payload)
+            _metadata_cache.move_to_end(key)
+            while len(_metadata_cache) > _METADATA_CACHE_SIZE:
+                _metadata_cache.popitem(last=False)
+    return payload
+
+
+_GRIST_PREFIX = "grist://"
+_GRIST_PREFIX_LEN = len(_GRIST_PREFIX)
+
+# grist://<doc_id>[/<table_id>[/...]][?<query>][#...]
+_URI_RE = re.compile(
+    r"(?i:grist)://(?P<doc_id>[^/?#]*)"
+    r"(?:/(?P<table_id>[^/?#]*))?[^?#]*"
+    r"(?:\?(?P<query>[^#]*))?"
+)
+
+
+@functools.lru_cache(maxsize=1024)
+def _parse_grist_uri(
+    uri: str,
+) -> Tuple[str, Optional[str], Tuple[Tuple[str, str], ...]]:
+    """
+    Split a ``grist://<doc_id>/<table_id>?<options>`` URI.
+
+    Returns the doc id, the table id (if any) and the first value of each
+    query string option. Memoized, since Shillelagh instantiates an adapter
+    for every statement over the same handful of URIs.
+    """
+    match = _URI_RE.match(uri)
+    if match is None:
+        raise ValueError(f"Invalid Grist URI: {uri}")
+    query = match["query"]
+    options: Dict[str, str] = {}
+    if query:
+        for k, v in urllib.parse.parse_qsl(query):
+            options.setdefault(k, v)
+    return match["doc_id"], match["table_id"], tuple(options.items())
+
+
+def _sort_param(order: List[Tuple[str, RequestedOrder]]) -> str:
+    """
+    Build the ``sort`` parameter of the records endpoint, e.g. ``"-date,name"``.
+    """
+    return ",".join(
+        f"-{column}" if direction is Order.DESCENDING else column
+        for column, direction in order
+    )
+
+
+# Fields are never mutated once built, so columns of the same Grist type
+# share a single instance.
+@functools.lru_cache(maxsize=None)
+def _gettype(type: str) -> Field:
+    """
+    Map a Grist column type to a Shillelagh field.
+    """
+    # equality on these is pushed down to Grist's ``filter`` parameter, and
+    # ranges on numbers and dates are served from a fetch sorted on the column
+    if type == "Text":
+        return String(filters=[Equal], exact=True, order=Order.ANY)
+    elif type == "Int":
+        return Integer(filters=[Equal, Range], exact=False, order=Order.ANY)
+    elif type == "Numeric":
+        return Float(filters=[Equal, Range], exact=False, order=Order.ANY)
+    elif type == "Bool":
+        return Boolean(filters=[Equal], exact=True, order=Order.ANY)
+    elif type == "Choice":
+        return String(filters=[Equal], exact=True, order=Order.ANY)
+    elif type == "ChoiceList":
+        return String(order=Order.ANY)
+    elif type == "Date":
+        return Date(filters=[Range], exact=False, order=Order.ANY)
+    elif type.startswith("DateTime:"):
+        return DateTime(filters=[Range], exact=False, order=Order.ANY)
+    elif type.startswith("Ref:"):
+        return String(order=Order.ANY)
+    elif type.startswith("RefList:"):
+        return String(order=Order.ANY)
+    elif type == "Attachments":
+        return String(order=Order.ANY)
+    else:
+        logger.debug("type=%r", type)
+        return String(order=Order.ANY)
+
+
+# Schemas of the listing endpoints, which are the same for every adapter.
+# The listing endpoints can't sort, so ordering is left to SQLite.
+_TABLES_COLUMNS: Dict[str, Field] = {
+    "id": String(order=Order.NONE),
+}
+_DOCS_COLUMNS: Dict[str, Field] = {
+    # the workspace id, which selects a single workspace from the listing
+    "id": Integer(filters=[Equal], exact=True, order=Order.NONE),
+    "name": String(order=Order.NONE),
+    "access": String(order=Order.NONE),
+    "orgDomain": String(order=Order.NONE),
+    "doc_id": String(order=Order.NONE),
+    "doc_name": String(order=Order.NONE),
+    "doc_createdAt": String(order=Order.NONE),
+    "doc_updatedAt": String(order=Order.NONE),
+}
+
+
 class GristAPI(Adapter):
     """
     An adapter for the Grist API.
@@ -64,12 +482,14 @@ class GristAPI(Adapter):
     # Set this to ``True`` if the adapter doesn't access the filesystem.
     safe = True
 
+    supports_limit = True
+    supports_offset = True
+    supports_requested_columns = True
+
     @staticmethod
     def supports(uri: str, fast: bool = True, **kwargs: Any) -> Optional[bool]:
-        logger.debug(f"supports {uri=} {fast=} {kwargs=}")
-        parsed = urllib.parse.urlparse(uri)
-        logger.debug(f"supports {parsed=}")
-        return parsed.scheme == "grist"
+        # called for every table in every statement, so no URL parsing here
+        return uri[:_GRIST_PREFIX_LEN].lower() == _GRIST_PREFIX
 
     @staticmethod
     def parse_uri(uri: str) -> Tuple[str]:
@@ -84,31 +504,20 @@ class GristAPI(Adapter):
     ):
         super().__init__()
 
-        parsed = urllib.parse.urlparse(uri)
-        query_string = urllib.parse.parse_qs(parsed.query)
-
-        split_path = parsed.path.split("/")
-        self.table_id = None
-        if len(split_path) > 1:
-            self.table_id = split_path[1]
-        self.doc_id = parsed.netloc
-        logger.debug(f"__init__ {self.doc_id=}")
+        self.doc_id, self.table_id, options = _parse_grist_uri(uri)
+        query_string = dict(options)
+        logger.debug("__init__ self.doc_id=%r", self.doc_id)
         if not api_key:
-            api_key = query_string["key"][0]
+            api_key = query_string["key"]
         if not server:
-            server = query_string["server"][0]
+            server = query_string["server"]
         if not org_id:
-            org_id = query_string["org_id"][0]
+            org_id = query_string["org_id"]
         self.org_id = org_id
         self.headers = {"Authorization": f"Bearer {api_key}"}
         self.server = server
 
-        backend = request_cache_backend()
-        self._session = requests_cache.CachedSession(
-            cache_name="grist_cache",
-            backend=backend,
-            expire_after=180,
-        )
+        self._session = _get_session(request_cache_backend())
 
         if self.doc_id:
             if self.table_id:
@@ -124,64 +533,29 @@ class GristAPI(Adapter):
         https://support.getgrist.com/api/#tag/columns/operation/listColumns
         to set column types
         """
-        logger.debug(f"_set_columns_data {self.table_id=}")
+        logger.debug("_set_columns_data self.table_id=%r", self.table_id)
         url = f"{self.server}/api/docs/{self.doc_id}/tables/{self.table_id}/columns"
 
-        response = requests.get(url, headers=self.headers)
-        columns = response.json()["columns"]
-
-        def gettype(type):
-            if type == "Text":
-                return String(order=Order.ANY)
-            elif type == "Int":
-                return Integer(order=Order.ANY)
-            elif type == "Numeric":
-                return Float(order=Order.ANY)
-            elif type == "Bool":
-                return Boolean(order=Order.ANY)
-            elif type == "Choice":
-                return String(order=Order.ANY)
-            elif type == "ChoiceList":
-                return String(order=Order.ANY)
-            elif type == "Date":
-                return Date(filters=[Range], exact=False, order=Order.ANY)
-            elif type.startswith("DateTime:"):
-                return DateTime(filters=[Range], exact=False, order=Order.ANY)
-            elif type.startswith("Ref:"):
-                return String(order=Order.ANY)
-            elif type.startswith("RefList:"):
-                return String(order=Order.ANY)
-            elif type == "Attachments":
-                return String(order=Order.ANY)
-            else:
-                logger.debug(f"{type=}")
-                return String(order=Order.ANY)
+        columns = _get_metadata(self._session, url, self.headers)["columns"]
 
-        labeltypes = [(c["id"], gettype(c["fields"]["type"])) for c in columns]
-        self.columns: Dict[str, Field] = {lt[0]: lt[1] for lt in labeltypes}
-        self.columns_datestimes = {
-            k: v for k, v in self.columns.items() if type(v) in [Date, DateTime]
-        }
-        self.columns["id"] = Integer(order=Order.ANY)
+        self.columns: Dict[str, Field] = {}
+        self._col_converters: Dict[str, Callable[[Any], Any]] = {}
+        for column in columns:
+            column_id = column["id"]
+            field = self.columns[column_id] = _gettype(column["fields"]["type"])
+            converter = _CONVERTERS.get(type(field))
+            if converter is not None:
+                self._col_converters[column_id] = converter
+        self.columns["id"] = Integer(filters=[Equal], exact=True, order=Order.ANY)
         # self.columns["manualSort"] = Integer(order=Order.ANY)
-        logger.debug(f"_set_columns_data {self.columns=}")
+        self._convert_record = _record_converter(self._col_converters)
+        logger.debug("_set_columns_data self.columns=%r", self.columns)
 
     def _set_columns_tables(self) -> Dict[str, Field]:
-        self.columns = {
-            "id": String(order=Order.ANY),
-        }
+        self.columns = _TABLES_COLUMNS
 
     def _set_columns_docs(self) -> Dict[str, Field]:
-        self.columns = {
-            "id": Integer(order=Order.ANY),
-            "name": String(order=Order.ANY),
-            "access": String(order=Order.ANY),
-            "orgDomain": String(order=Order.ANY),
-            "doc_id": String(order=Order.ANY),
-            "doc_name": String(order=Order.ANY),
-            "doc_createdAt": String(order=Order.ANY),
-            "doc_updatedAt": String(order=Order.ANY),
-        }
+        self.columns = _DOCS_COLUMNS
 
     def fetch_table(
         self,
@@ -196,25 +570,105 @@ class GristAPI(Adapter):
         """
         logger.debug("fetch_table")
         url = f"{self.server}/api/docs/{self.doc_id}/tables/{self.table_id}/records"
-        logger.debug(f"fetch_table {url=}")
-
-        response = requests.get(url, headers=self.headers)
-        records = response.json()["records"]
-        for record in records:
-            field = record["fields"]
-            logger.debug(f"{field=}")
-            logger.debug(f"{self.columns=}")
-            f = {}
-            f["id"] = record["id"]
-            for k, v in field.items():
-                if isinstance(self.columns[k], Date) and v is not None:
-                    v = date.fromtimestamp(int(v))
-                elif isinstance(self.columns[k], DateTime) and v is not None:
-                    v = datetime.fromtimestamp(int(v))
-                elif isinstance(v, list):
-                    v = ",".join([str(item) for item in v])
-                f[k] = v
-            yield f
+        logger.debug("fetch_table url=%r", url)
+
+        params: Dict[str, Any] = {}
+        # SQL ``IN`` reaches the adapter as one ``Equal`` per value
+        filters = {
+            column: [bound.value]
+            for column, bound in bounds.items()
+            if isinstance(bound, Equal)
+        }
+        if filters:
+            params["filter"] = json_dumps(filters)
+        ranges = [
+            (column, *_range_bounds(bound))
+            for column, bound in bounds.items()
+            if isinstance(bound, Range)
+        ]
+        range_column = None
+        if order:
+            params["sort"] = _sort_param(order)
+        else:
+            # Grist can't filter on ranges, but sorting on a column with an
+            # upper bound lets the loop below stop there. The local clock of
+            # ``DateTime`` cells goes back when DST ends, so they're not used.
+            for index, (column, _, end, *_) in enumerate(ranges):
+                if end is not None and not isinstance(self.columns[column], DateTime):
+                    range_column = column
+                    ranges.insert(0, ranges.pop(index))
+                    params["sort"] = column
+                    break
+
+        limit = kwargs.get("limit")
+        # SQLite applies neither LIMIT nor OFFSET once they're pushed down, and
+        # Grist has no offset parameter, so the rows before it are fetched too
+        # and skipped here
+        offset = kwargs.get("offset") or 0
+        if limit is not None and not ranges:
+            params["limit"] = limit + offset
+
+        response = _coalesced_get(
+            self._session,
+            url,
+            self.headers,
+            params=params,
+            expire_after=_jittered(_RECORDS_TTL),
+        )
+        # The body is buffered anyway, since it goes into the cache, and orjson
+        # decodes it faster than ijson iterates it. Decoding records one at a
+        # time only pays when the loop below may stop before the end, as Grist
+        # already applied the limit otherwise.
+        early_stop = range_column is not None or (ranges and limit is not None)
+        if ijson is not None and response.ok and (not _HAS_ORJSON or early_stop):
+            records = ijson.items(
+                io.BytesIO(response.content), "records.item", use_float=True
+            )
+        else:
+            records = json_loads(response.content)["records"]
+        # Grist has no projection parameter, but columns the statement doesn't
+        # use can still be left unconverted and out of the rows
+        requested_columns = kwargs.get("requested_columns")
+        if requested_columns is not None and len(requested_columns) < len(
+            self.columns
+        ):
+            columns = set(requested_columns)
+            columns.update(range_[0] for range_ in ranges)
+            convert = _projected_record_converter(
+                self._col_converters,
+                tuple(columns),
+            )
+        else:
+            convert = self._convert_record
+        if not ranges:
+            yield from itertools.islice(map(convert, records), offset, None)
+            return
+
+        # ranges are checked here as well as by SQLite, so that the offset and
+        # the limit count the rows SQLite keeps
+        skipped = emitted = 0
+        for field in map(convert, records):
+            positions = [
+                _range_position(field.get(column), *range_)
+                for column, *range_ in ranges
+            ]
+            if range_column is not None and positions[0] == 1:
+                # sorted on this column, so no later row is in range
+                break
+            if -1 in positions or 1 in positions:
+                continue
+            if None in positions:
+                # SQLite may reject the row, so it doesn't count towards the
+                # offset or the limit
+                yield field
+                continue
+            if skipped < offset:
+                skipped += 1
+                continue
+            yield field
+            emitted += 1
+            if limit is not None and emitted >= limit:
+                break
 
     def fetch_table_ids(
         self,
@@ -229,8 +683,7 @@ class GristAPI(Adapter):
         """
         url = f"{self.server}/api/docs/{self.doc_id}/tables"
 
-        response = requests.get(url, headers=self.headers)
-        tables = response.json()["tables"]
+        tables = _get_metadata(self._session, url, self.headers)["tables"]
         for table in tables:
             yield {"id": table["id"]}
 
@@ -247,20 +700,29 @@ class GristAPI(Adapter):
         """
         url = f"{self.server}/api/orgs/{self.org_id}/workspaces"
 
-        response = requests.get(url, headers=self.headers)
-        workspaces = response.json()
+        workspaces = _get_metadata(self._session, url, self.headers)
+        bound = bounds.get("id")
         for workspace in workspaces:
+            workspace_id = workspace["id"]
+            if bound is not None and workspace_id != bound.value:
+                continue
+            name = workspace["name"]
+            access = workspace["access"]
+            org_domain = workspace["orgDomain"]
             for doc in workspace["docs"]:
                 yield {
-                    "id": workspace["id"],
-                    "name": workspace["name"],
-                    "access": workspace["access"],
-                    "orgDomain": workspace["orgDomain"],
+                    "id": workspace_id,
+                    "name": name,
+                    "access": access,
+                    "orgDomain": org_domain,
                     "doc_id": doc["id"],
                     "doc_name": doc["name"],
                     "doc_createdAt": doc["createdAt"],
                     "doc_updatedAt": doc["updatedAt"],
                 }
+            if bound is not None:
+                # workspace ids are unique
+                break
 
     def get_columns(self) -> Dict[str, Field]:
         return self.columns
@@ -276,11 +738,15 @@ class GristAPI(Adapter):
     ) -> Iterator[Row]:
         if self.doc_id:
             if self.table_id:
-                logger.debug(f"get_rows fetch_table {self.doc_id=} {self.table_id}")
+                logger.debug(
+                    "get_rows fetch_table self.doc_id=%r %s", self.doc_id, self.table_id
+                )
                 return self.fetch_table(bounds, order, **kwargs)
             else:
-                logger.debug(f"get_rows fetch_table_ids {self.doc_id=}")
-                return self.fetch_table_ids(bounds, order, **kwargs)
+                logger.debug("get_rows fetch_table_ids self.doc_id=%r", self.doc_id)
+                rows = self.fetch_table_ids(bounds, order, **kwargs)
         else:
             logger.debug("get_rows fetch_docs_ids")
-            return self.fetch_docs_ids(bounds, order, **kwargs)
+            rows = self.fetch_docs_ids(bounds, order, **kwargs)
+        # listings are only filtered exactly, so SQLite keeps every row
+        return itertools.islice(rows, kwargs.get("offset") or 0, None)
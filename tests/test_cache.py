@@ -0,0 +1,104 @@
+"""
+Offline tests of the request cache backend and its cleanup.
+"""
+import pickle
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from requests_cache import BaseCache, SQLiteCache
+from requests_cache.models import CachedResponse
+from requests_cache.serializers import pickle_serializer
+
+import shillelagh_gristapi
+
+
+def fill(backend):
+    now = datetime.now(timezone.utc)
+    for key, expires in [
+        ("fresh", now + timedelta(hours=1)),
+        ("stale", now - timedelta(seconds=10)),
+        ("old", now - timedelta(hours=1)),
+        ("forever", None),
+    ]:
+        backend.responses[key] = CachedResponse(status_code=200, expires=expires)
+    backend.redirects["to_old"] = "old"
+    backend.redirects["to_fresh"] = "fresh"
+
+
+@pytest.fixture
+def sqlite_backend(tmp_path, monkeypatch):
+    backend = SQLiteCache(
+        tmp_path / "grist_cache", serializer=shillelagh_gristapi._SERIALIZER
+    )
+    monkeypatch.setattr(shillelagh_gristapi, "_REQUEST_CACHE_BACKEND", backend)
+    fill(backend)
+    yield backend
+    backend.close()
+
+
+@pytest.fixture
+def memory_backend(monkeypatch):
+    backend = BaseCache()
+    monkeypatch.setattr(shillelagh_gristapi, "_REQUEST_CACHE_BACKEND", backend)
+    fill(backend)
+    return backend
+
+
+def test_sqlite_cleanup(sqlite_backend):
+    shillelagh_gristapi.cleanup()
+    assert sorted(sqlite_backend.responses.keys()) == ["forever", "fresh"]
+    assert list(sqlite_backend.redirects.keys()) == ["to_fresh"]
+
+
+def test_sqlite_cleanup_max_stale(sqlite_backend):
+    shillelagh_gristapi.cleanup(max_stale=60)
+    assert sorted(sqlite_backend.responses.keys()) == ["forever", "fresh", "stale"]
+    assert list(sqlite_backend.redirects.keys()) == ["to_fresh"]
+
+
+def test_memory_cleanup(memory_backend):
+    shillelagh_gristapi.cleanup(max_stale=60)
+    assert sorted(memory_backend.responses.keys()) == ["forever", "fresh", "stale"]
+    shillelagh_gristapi.cleanup()
+    assert sorted(memory_backend.responses.keys()) == ["forever", "fresh"]
+
+
+def test_sqlite_pragmas_survive_reconnects(tmp_path, monkeypatch):
+    monkeypatch.setattr(shillelagh_gristapi, "_REQUEST_CACHE_BACKEND", None)
+    monkeypatch.setattr(
+        shillelagh_gristapi, "_REQUEST_CACHE_NAME", str(tmp_path / "grist_cache")
+    )
+    backend = shillelagh_gristapi.request_cache_backend()
+    # clear() drops the tables and reopens both connections
+    backend.clear()
+    for storage in (backend.responses, backend.redirects):
+        with storage.connection() as con:
+            assert con.execute("PRAGMA cache_size").fetchone() == (-64000,)
+            assert con.execute("PRAGMA temp_store").fetchone() == (2,)
+    backend.close()
+
+
+@pytest.mark.parametrize("size", [10, 4096, 4097, 100_000])
+def test_compression_round_trip(size):
+    data = b"{" + b"a" * (size - 1)
+    compressed = shillelagh_gristapi._compress(data)
+    assert (compressed != data) == (size > shillelagh_gristapi._COMPRESS_MIN_SIZE)
+    assert shillelagh_gristapi._decompress(compressed) == data
+
+
+@pytest.mark.parametrize("size", [10, 100_000])
+def test_serializer_round_trip(size):
+    response = CachedResponse(status_code=200)
+    response._content = b"x" * size
+    serialized = shillelagh_gristapi._SERIALIZER.dumps(response)
+    assert (len(serialized) < size) == (size > shillelagh_gristapi._COMPRESS_MIN_SIZE)
+    assert shillelagh_gristapi._SERIALIZER.loads(serialized).content == b"x" * size
+
+
+def test_uncompressed_pickles_still_load():
+    # stored before compression, by requests-cache's own pickle serializer
+    response = CachedResponse(status_code=200)
+    response._content = b"x" * 100_000
+    legacy = pickle_serializer.dumps(response)
+    assert legacy[:1] == pickle.PROTO
+    assert shillelagh_gristapi._SERIALIZER.loads(legacy).content == b"x" * 100_000
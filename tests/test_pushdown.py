@@ -0,0 +1,406 @@
+"""
+Offline tests of the filter, sort and limit pushdown, against a stubbed Grist.
+"""
+import json
+import threading
+import time
+from datetime import date
+from urllib.parse import parse_qs, urlparse
+
+import pytest
+import requests
+from requests_cache import BaseCache
+from requests_cache.models import CachedResponse
+from requests_cache.policy import get_expiration_datetime
+from shillelagh.backends.apsw.db import connect
+
+import shillelagh_gristapi
+from shillelagh_gristapi import grist
+
+COLUMNS = [
+    {"id": "name", "fields": {"type": "Text"}},
+    {"id": "n", "fields": {"type": "Int"}},
+    {"id": "x", "fields": {"type": "Numeric"}},
+    {"id": "d", "fields": {"type": "Date"}},
+    {"id": "t", "fields": {"type": "DateTime:America/New_York"}},
+    {"id": "tags", "fields": {"type": "ChoiceList"}},
+]
+
+# noon UTC, so the day doesn't depend on the local timezone
+DAY = 86400
+RECORDS = [
+    {
+        "id": i,
+        "fields": {
+            "name": f"r{i:03d}",
+            "n": i,
+            "x": i / 10,
+            "d": DAY * i + DAY // 2,
+            "t": DAY * i + DAY // 2,
+            "tags": ["L", "a", "b"] if i % 2 else None,
+        },
+    }
+    for i in range(1, 101)
+]
+
+
+def value(record, column):
+    return record["id"] if column == "id" else record["fields"].get(column)
+
+
+class FakeResponse:
+    def __init__(self, payload):
+        self.content = json.dumps(payload).encode()
+        self.ok = True
+        self.from_cache = False
+        self.expires = None
+
+
+class FakeSession:
+    """
+    Answers the Grist endpoints the adapter uses, applying ``filter``,
+    ``sort`` and ``limit`` to the records like Grist does.
+    """
+
+    def __init__(self, records):
+        self.records = records
+        self.requests = []
+        self.sort_key = lambda value: value
+
+    def get(self, url, headers=None, params=None, **kwargs):
+        path = urlparse(url).path
+        params = dict(params or {})
+        self.requests.append((path, params))
+        if path.endswith("/columns"):
+            return FakeResponse({"columns": COLUMNS})
+
+        records = self.records
+        for column, values in json.loads(params.get("filter", "{}")).items():
+            records = [r for r in records if value(r, column) in values]
+        for key in reversed(params.get("sort", "").split(",")):
+            if key:
+                column = key.lstrip("-")
+                records = sorted(
+                    records,
+                    key=lambda r: self.sort_key(value(r, column)),
+                    reverse=key.startswith("-"),
+                )
+        if "limit" in params:
+            records = records[: int(params["limit"])]
+        return FakeResponse({"records": records})
+
+    def records_params(self):
+        return [params for path, params in self.requests if path.endswith("/records")]
+
+
+@pytest.fixture
+def session(monkeypatch):
+    session = FakeSession(json.loads(json.dumps(RECORDS)))
+    monkeypatch.setattr(shillelagh_gristapi, "_REQUEST_CACHE_BACKEND", BaseCache())
+    monkeypatch.setattr(grist, "_get_session", lambda backend: session)
+    monkeypatch.setattr(grist, "_metadata_cache", grist.OrderedDict())
+    return session
+
+
+@pytest.fixture
+def cursor(session):
+    connection = connect(
+        ":memory:",
+        adapters=["gristapi"],
+        adapter_kwargs={
+            "gristapi": {
+                "api_key": "key",
+                "server": "https://grist.test",
+                "org_id": "1",
+            }
+        },
+    )
+    return connection.cursor()
+
+
+def ids(cursor, where):
+    cursor.execute(f'SELECT id FROM "grist://doc/table" {where}')
+    return [row[0] for row in cursor.fetchall()]
+
+
+
+def baseline_parse(uri):
+    # the urlparse-based parsing _parse_grist_uri replaced
+    parsed = urlparse(uri)
+    split_path = parsed.path.split("/")
+    table_id = split_path[1] if len(split_path) > 1 else None
+    options = {k: v[0] for k, v in parse_qs(parsed.query).items()}
+    return parsed.netloc, table_id, options
+
+
+@pytest.mark.parametrize(
+    "uri, expected",
+    [
+        ("grist://", ("", None, {})),
+        ("grist://doc", ("doc", None, {})),
+        ("grist://doc/", ("doc", "", {})),
+        ("grist://doc/table", ("doc", "table", {})),
+        ("grist://doc/table/", ("doc", "table", {})),
+        ("grist://doc/table/extra", ("doc", "table", {})),
+        ("GRIST://doc/table", ("doc", "table", {})),
+        ("grist://doc/table#top", ("doc", "table", {})),
+        (
+            "grist://doc/table?key=k&server=s&key=other",
+            ("doc", "table", {"key": "k", "server": "s"}),
+        ),
+        ("grist://doc?org_id=1", ("doc", None, {"org_id": "1"})),
+    ],
+)
+def test_parse_grist_uri(uri, expected):
+    doc_id, table_id, options = grist._parse_grist_uri(uri)
+    assert (doc_id, table_id, dict(options)) == expected == baseline_parse(uri)
+
+
+@pytest.mark.parametrize("uri", ["http://doc/table", "gristx://doc", "doc/table", ""])
+def test_parse_grist_uri_rejects(uri):
+    assert urlparse(uri).scheme != "grist"
+    assert not grist.GristAPI.supports(uri)
+    with pytest.raises(ValueError):
+        grist._parse_grist_uri(uri)
+
+def test_sort_and_limit_pushdown(cursor, session):
+    assert ids(cursor, "ORDER BY n DESC LIMIT 3") == [100, 99, 98]
+    assert session.records_params() == [{"sort": "-n", "limit": 3}]
+
+
+
+def test_limit_and_offset(cursor, session):
+    # Grist has no offset, so it's added to the limit and skipped locally
+    assert ids(cursor, "ORDER BY n LIMIT 3 OFFSET 2") == [3, 4, 5]
+    assert ids(cursor, "LIMIT 3 OFFSET 2") == [3, 4, 5]
+    assert session.records_params() == [{"sort": "n", "limit": 5}, {"limit": 5}]
+
+
+def test_range_limit_and_offset(cursor, session):
+    assert ids(cursor, "WHERE n > 90 LIMIT 3 OFFSET 2") == [93, 94, 95]
+    assert ids(cursor, "WHERE n > 90 ORDER BY id LIMIT 3 OFFSET 2") == [93, 94, 95]
+    # rows the other range rejects don't count towards the offset
+    assert ids(cursor, "WHERE n > 90 AND x < 9.6 LIMIT 3 OFFSET 2") == [93, 94, 95]
+
+def test_equal_pushdown(cursor, session):
+    assert ids(cursor, "WHERE name = 'r005'") == [5]
+    (params,) = session.records_params()
+    assert json.loads(params["filter"]) == {"name": ["r005"]}
+
+
+def test_in_pushdown(cursor, session):
+    assert sorted(ids(cursor, "WHERE n IN (3, 7)")) == [3, 7]
+    filters = [json.loads(params["filter"]) for params in session.records_params()]
+    assert sorted(filters, key=str) == [{"n": [3]}, {"n": [7]}]
+
+
+def test_range_sorts_on_the_bounded_column(cursor, session):
+    assert ids(cursor, "WHERE n < 5") == [1, 2, 3, 4]
+    assert ids(cursor, "WHERE n > 2 AND x < 0.5") == [3, 4]
+    # only an upper bound can stop the fetch early
+    assert ids(cursor, "WHERE n > 95") == [96, 97, 98, 99, 100]
+    assert session.records_params() == [{"sort": "n"}, {"sort": "x"}, {}]
+
+
+def test_range_and_limit(cursor, session):
+    assert ids(cursor, "WHERE n > 90 LIMIT 3") == [91, 92, 93]
+    assert "limit" not in session.records_params()[0]
+
+
+def test_range_with_order_by_does_not_push_limit(cursor, session):
+    assert ids(cursor, "WHERE n > 90 ORDER BY id LIMIT 3") == [91, 92, 93]
+    assert ids(cursor, "WHERE x > 3 ORDER BY id LIMIT 5") == [31, 32, 33, 34, 35]
+    assert ids(cursor, "WHERE d > '1970-03-01' ORDER BY id LIMIT 3") == [60, 61, 62]
+    assert all("limit" not in params for params in session.records_params())
+
+
+@pytest.fixture
+def new_york(monkeypatch):
+    # DateTime cells are yielded in local time
+    monkeypatch.setenv("TZ", "America/New_York")
+    time.tzset()
+    grist._timestamp_to_datetime.cache_clear()
+    yield
+    monkeypatch.undo()
+    time.tzset()
+    grist._timestamp_to_datetime.cache_clear()
+
+
+def test_aware_datetime_range(cursor, session, new_york):
+    # row 94 is 1970-04-05T07:00:00 locally, 12:00 in UTC
+    where = "WHERE t > '1970-04-05T03:00:00Z' AND t < '1970-04-05T10:00:00Z'"
+    assert ids(cursor, where) == [94]
+    assert ids(cursor, f"{where} ORDER BY id") == [94]
+    # SQLite compares text, and the naive cells sort below equal aware bounds
+    where = "WHERE t >= '1970-04-05T07:00:00Z' AND t <= '1970-04-07T07:00:00Z'"
+    assert ids(cursor, f"{where} ORDER BY id") == [95, 96]
+    assert ids(cursor, f"{where} LIMIT 1 OFFSET 1") == [96]
+
+
+def test_two_ranges_and_limit(cursor, session):
+    # whichever column the fetch is sorted on, the other one drops early rows
+    rows = ids(cursor, "WHERE n > 10 AND x < 8 LIMIT 3")
+    assert len(rows) == 3
+    assert all(10 < row < 80 for row in rows)
+    rows = ids(cursor, "WHERE n > 10 AND x > 5 LIMIT 3")
+    assert len(rows) == 3
+    assert all(row > 50 for row in rows)
+
+
+def test_uncomparable_cells_dont_count_towards_limit(cursor, session):
+    # Grist keeps text typed into a numeric column as is
+    session.records[0]["fields"]["n"] = "one"
+    session.sort_key = lambda value: (not isinstance(value, str), value)
+    assert ids(cursor, "WHERE n < 5 LIMIT 3") == [2, 3, 4]
+
+
+
+def test_projection(cursor, session, monkeypatch):
+    projections = []
+    projected_converter = grist._projected_record_converter
+
+    def spy(converters, columns):
+        projections.append(sorted(columns))
+        return projected_converter(converters, columns)
+
+    monkeypatch.setattr(grist, "_projected_record_converter", spy)
+    cursor.execute('SELECT x, d, name FROM "grist://doc/table" WHERE id IN (3, 4)')
+    assert sorted(cursor.fetchall()) == [
+        (0.3, date(1970, 1, 4), "r003"),
+        (0.4, date(1970, 1, 5), "r004"),
+    ]
+    assert projections == [["d", "id", "name", "x"]] * 2
+
+    projections.clear()
+    cursor.execute('SELECT * FROM "grist://doc/table" WHERE id = 3')
+    ((name, n, x, d, _, tags, id_),) = cursor.fetchall()
+    assert (id_, name, n, x, d, tags) == (3, "r003", 3, 0.3, date(1970, 1, 4), "L,a,b")
+    assert projections == []
+
+def test_alt_text_in_list_columns(cursor, session):
+    session.records[1]["fields"]["tags"] = 7
+    session.records[3]["fields"]["tags"] = "not a list"
+    cursor.execute('SELECT id, tags FROM "grist://doc/table" WHERE id IN (1, 2, 4)')
+    assert sorted(cursor.fetchall()) == [(1, "L,a,b"), (2, 7), (4, "not a list")]
+
+
+def test_only_early_stops_stream_records(cursor, session, monkeypatch):
+    ijson = pytest.importorskip("ijson")
+    streamed = []
+
+    class Ijson:
+        def items(self, *args, **kwargs):
+            streamed.append(True)
+            return ijson.items(*args, **kwargs)
+
+    monkeypatch.setattr(grist, "ijson", Ijson())
+    monkeypatch.setattr(grist, "_HAS_ORJSON", True)
+    assert len(ids(cursor, "")) == 100
+    assert len(ids(cursor, "ORDER BY n DESC")) == 100
+    # Grist applies the limit, so the records are all used
+    assert len(ids(cursor, "LIMIT 5")) == 5
+    assert not streamed
+    assert ids(cursor, "WHERE n < 3") == [1, 2]
+    assert streamed
+
+
+
+
+def workspace(id_, *docs):
+    return {
+        "id": id_,
+        "name": f"w{id_}",
+        "access": "owners",
+        "orgDomain": "o",
+        "docs": [
+            {"id": doc, "name": doc, "createdAt": "c", "updatedAt": "u"}
+            for doc in docs
+        ],
+    }
+
+
+class Unread(dict):
+    def __getitem__(self, key):
+        raise AssertionError("workspaces after a match shouldn't be read")
+
+
+def test_docs_filtered_by_workspace(cursor, monkeypatch):
+    workspaces = [workspace(1, "a"), workspace(2, "b", "c"), Unread()]
+    read = []
+
+    def get_metadata(session, url, headers):
+        read.append(urlparse(url).path)
+        return workspaces
+
+    monkeypatch.setattr(grist, "_get_metadata", get_metadata)
+    cursor.execute('SELECT doc_id FROM "grist://" WHERE id = 2')
+    assert cursor.fetchall() == [("b",), ("c",)]
+    assert read == ["/api/orgs/1/workspaces"]
+    cursor.execute('SELECT doc_id FROM "grist://" WHERE id = 2 LIMIT 1 OFFSET 1')
+    assert cursor.fetchall() == [("c",)]
+
+class CachingSession(FakeSession):
+    """
+    Sends a request only on a cache miss, slowly enough for others to race it.
+    """
+
+    def __init__(self, records):
+        super().__init__(records)
+        self.cache = {}
+        self.sent = 0
+
+    def get(self, url, headers=None, params=None, **kwargs):
+        key = (url, json.dumps(params, sort_keys=True))
+        if key not in self.cache:
+            self.sent += 1
+            time.sleep(0.05)
+            self.cache[key] = super().get(url, headers, params, **kwargs)
+        return self.cache[key]
+
+
+def test_concurrent_gets_share_one_request():
+    session = CachingSession(RECORDS)
+    barrier = threading.Barrier(8)
+    responses = []
+
+    def get():
+        barrier.wait()
+        responses.append(
+            grist._coalesced_get(
+                session,
+                "https://grist.test/records",
+                {"Authorization": "k"},
+                params={"limit": 1},
+            )
+        )
+
+    threads = [threading.Thread(target=get) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert session.sent == 1
+    assert len(responses) == 8 and len({id(r) for r in responses}) == 1
+    assert grist._inflight == {}
+
+
+def test_failed_get_leaves_no_inflight_entry():
+    session = FakeSession(RECORDS)
+
+    def get(*args, **kwargs):
+        raise requests.ConnectionError("down")
+
+    session.get = get
+    with pytest.raises(requests.ConnectionError):
+        grist._coalesced_get(session, "https://grist.test/x", {"Authorization": "k"})
+    assert grist._inflight == {}
+
+def test_metadata_from_cache_keeps_its_expiry(session, monkeypatch):
+    # built by requests-cache itself, so ``expires`` is in the representation
+    # of the installed version, aware UTC from the 1.2 floor on
+    response = CachedResponse(status_code=200, expires=get_expiration_datetime(5))
+    response._content = json.dumps({"columns": COLUMNS}).encode()
+    monkeypatch.setattr(session, "get", lambda *args, **kwargs: response)
+    grist._get_metadata(session, "https://grist.test/columns", {"Authorization": "k"})
+    ((deadline, _),) = grist._metadata_cache.values()
+    assert deadline - time.monotonic() <= 5